@@ -1,8 +1,11 @@
 """Classes to represent and query categorical systems."""
 
 import datetime
+import functools
+import operator
 import pathlib
 import pickle
+import sys
 import typing
 
 import natsort
@@ -12,6 +15,15 @@ import strictyaml as sy
 from ruamel.yaml import YAML
 
 
+def _intern_code(code: str) -> str:
+    """Intern string codes, converting str subclasses like numpy.str_ to str.
+
+    Other codes are returned unchanged."""
+    if isinstance(code, str):
+        return sys.intern(str(code))
+    return code
+
+
 class Category:
     """A single category."""
 
@@ -32,7 +44,9 @@ class Category:
         comment: typing.Optional[str] = None,
         info: typing.Optional[dict] = None,
     ):
-        self.codes = codes
+        # codes are used as dictionary keys all over the place, interning them makes
+        # lookups cheaper and shares the string objects between categorizations
+        self.codes = tuple(_intern_code(code) for code in codes)
         self.title = title
         self.comment = comment
         self.categorization = categorization
@@ -92,6 +106,11 @@ class Category:
     def __hash__(self):
         return hash(self.categorization.name + self.codes[0])
 
+    def __reduce__(self):
+        # a category is only meaningful as part of its categorization, so pickle it
+        # as a lookup in the (pickled) categorization
+        return operator.getitem, (self.categorization, self.codes[0])
+
     def __lt__(self, other):
         s = natsort.natsorted((self.codes[0], other.codes[0]))
         if s[0] == self.codes[0] and not self == other:
@@ -156,6 +175,18 @@ class HierarchicalCategory(Category):
         """
         return self.categorization.parents(self)
 
+    @property
+    def descendants(self) -> typing.Set["HierarchicalCategory"]:
+        """All transitive children of this category, considering all sets of
+        children."""
+        return self.categorization.descendants(self)
+
+    @property
+    def ancestors(self) -> typing.Set["HierarchicalCategory"]:
+        """All transitive parents of this category, considering all sets of
+        children."""
+        return self.categorization.ancestors(self)
+
     @property
     def level(self) -> int:
         """The level of the category.
@@ -202,6 +233,8 @@ class Categorization:
 
     hierarchical: bool = False
 
+    _category_class = Category
+
     _strictyaml_schema = sy.Map(
         {
             "name": sy.Str(),
@@ -218,9 +251,11 @@ class Categorization:
 
     def _add_categories(self, categories: typing.Dict[str, typing.Dict]):
         for code, spec in categories.items():
-            cat = Category.from_spec(code=code, spec=spec, categorization=self)
+            cat = self._category_class.from_spec(
+                code=code, spec=spec, categorization=self
+            )
 
-            self._primary_code_map[code] = cat
+            self._primary_code_map[cat.codes[0]] = cat
             for icode in cat.codes:
                 self._all_codes_map[icode] = cat
 
@@ -238,6 +273,7 @@ class Categorization:
     ):
         self._primary_code_map = {}
         self._all_codes_map = {}
+        self._df_cache: typing.Optional[pandas.DataFrame] = None
         self.name = name
         self.references = references
         self.title = title
@@ -354,6 +390,17 @@ class Categorization:
         """Get the category for a code."""
         return self._all_codes_map[code]
 
+    def getmany(self, codes: typing.Iterable[str]) -> typing.List[Category]:
+        """Get the categories for many codes at once.
+
+        Equivalent to ``[cat[code] for code in codes]``, but faster for many codes,
+        e.g. for the codes in a column of a pandas DataFrame."""
+        if hasattr(codes, "tolist"):
+            # iterating over pandas or numpy objects element by element is slow
+            codes = codes.tolist()
+        all_codes_map = self._all_codes_map
+        return [all_codes_map[code] for code in codes]
+
     def __contains__(self, code: str) -> bool:
         """Can the code be mapped to a category?"""
         return code in self._all_codes_map
@@ -369,67 +416,108 @@ class Categorization:
     def __str__(self) -> str:
         return self.name
 
+    def _df_columns(self) -> typing.Dict[str, list]:
+        """The columns of the dataframe representation, one list per attribute."""
+        cats = list(self.values())
+        return {
+            "title": [cat.title for cat in cats],
+            "comment": [cat.comment for cat in cats],
+            "alternative_codes": [cat.codes[1:] for cat in cats],
+        }
+
     @property
     def df(self) -> "pandas.DataFrame":
-        """All category codes as a pandas dataframe."""
-        titles = []
-        comments = []
-        alternative_codes = []
-        for cat in self.values():
-            titles.append(cat.title)
-            comments.append(cat.comment)
-            alternative_codes.append(cat.codes[1:])
-        return pandas.DataFrame(
-            index=self.keys(),
-            data={
-                "title": titles,
-                "comment": comments,
-                "alternative_codes": alternative_codes,
-            },
-        )
+        """All category codes as a pandas dataframe.
+
+        The dataframe is built on first access and cached, later accesses return a
+        copy of the cached dataframe. Changes to the categories after the first
+        access are therefore not reflected in the dataframe."""
+        if self._df_cache is None:
+            # the columns are freshly built lists, there is no need to copy them
+            self._df_cache = pandas.DataFrame(
+                index=list(self.keys()), data=self._df_columns(), copy=False
+            )
+        return self._df_cache.copy()
 
-    def _extend_prepare(
+    def _extend_metadata(
         self,
         *,
-        categories: typing.Optional[typing.Dict[str, typing.Dict]] = None,
-        alternative_codes: typing.Optional[typing.Dict[str, str]] = None,
         name: str,
         title: typing.Optional[str] = None,
         comment: typing.Optional[str] = None,
         last_update: typing.Optional[datetime.date] = None,
     ) -> typing.Dict[str, typing.Any]:
-        spec = self.to_spec()
-
-        spec["name"] = f"{self.name}_{name}"
-        spec["references"] = ""
-        spec["institution"] = ""
-
+        """The metadata of an extension of this categorization, ready to be passed
+        to the constructor."""
         if title is None:
-            spec["title"] = f"{self.title} + {name}"
+            title = f"{self.title} + {name}"
         else:
-            spec["title"] = self.title + title
+            title = self.title + title
 
         if comment is None:
-            spec["comment"] = f"{self.comment} extended by {name}"
+            comment = f"{self.comment} extended by {name}"
         else:
-            spec["comment"] = self.comment + comment
+            comment = self.comment + comment
 
         if last_update is None:
-            spec["last_update"] = datetime.date.today().isoformat()
-        else:
-            spec["last_update"] = last_update.isoformat()
+            last_update = datetime.date.today()
+
+        return {
+            "name": f"{self.name}_{name}",
+            "title": title,
+            "comment": comment,
+            "references": "",
+            "institution": "",
+            "last_update": last_update,
+            "version": self.version,
+        }
 
-        if categories is not None:
-            spec["categories"].update(categories)
+    def _extend_categories(
+        self,
+        ext: "Categorization",
+        *,
+        categories: typing.Optional[typing.Dict[str, typing.Dict]] = None,
+        alternative_codes: typing.Optional[typing.Dict[str, str]] = None,
+    ) -> None:
+        """Fill the empty categorization ext with the categories of this
+        categorization and the given additional categories and codes.
+
+        The existing categories are re-created with the codes, titles, comments
+        and info of the categories of this categorization, so that these are shared
+        instead of being re-created from a specification."""
+        if categories is None:
+            categories = {}
+
+        for code, cat in self.items():
+            if code in categories:
+                # categories given explicitly replace existing categories
+                Categorization._add_categories(ext, {code: categories[code]})
+            else:
+                ext._primary_code_map[code] = ext._category_class(
+                    codes=cat.codes,
+                    categorization=ext,
+                    title=cat.title,
+                    comment=cat.comment,
+                    info=cat.info,
+                )
+        Categorization._add_categories(
+            ext,
+            {
+                code: spec
+                for code, spec in categories.items()
+                if code not in self._primary_code_map
+            },
+        )
 
         if alternative_codes is not None:
             for alias, primary in alternative_codes.items():
-                if "alternative_codes" not in spec["categories"][primary]:
-                    spec["categories"][primary]["alternative_codes"] = []
-
-                spec["categories"][primary]["alternative_codes"].append(alias)
+                cat = ext._primary_code_map[primary]
+                cat.codes = cat.codes + (_intern_code(alias),)
 
-        return spec
+        # re-build the map of all codes so that alternative codes are in order
+        ext._all_codes_map = {
+            icode: cat for cat in ext._primary_code_map.values() for icode in cat.codes
+        }
 
     def extend(
         self,
@@ -477,16 +565,17 @@ class Categorization:
         -------
         Extended categorization : Categorization
         """
-        spec = self._extend_prepare(
-            name=name,
-            categories=categories,
-            title=title,
-            comment=comment,
-            last_update=last_update,
-            alternative_codes=alternative_codes,
+        ext = Categorization(
+            categories={},
+            **self._extend_metadata(
+                name=name, title=title, comment=comment, last_update=last_update
+            ),
+        )
+        self._extend_categories(
+            ext, categories=categories, alternative_codes=alternative_codes
         )
 
-        return Categorization.from_spec(spec)
+        return ext
 
     def __eq__(self, other):
         if not isinstance(other, Categorization):
@@ -495,6 +584,11 @@ class Categorization:
             return False
         return self._primary_code_map == other._primary_code_map
 
+    def __reduce__(self):
+        # the specification is a compact representation containing only strings,
+        # dicts and lists, and avoids pickling caches and the graph of categories
+        return from_spec, (self.to_spec(),)
+
 
 class HierarchicalCategorization(Categorization):
     """In a hierarchical categorization, descendants and ancestors (parents and
@@ -519,6 +613,8 @@ class HierarchicalCategorization(Categorization):
 
     hierarchical = True
 
+    _category_class = HierarchicalCategory
+
     _strictyaml_schema = sy.Map(
         {
             "name": sy.Str(),
@@ -538,24 +634,25 @@ class HierarchicalCategorization(Categorization):
     )
 
     def _add_categories(self, categories: typing.Dict[str, typing.Dict]):
-        for code, spec in categories.items():
-            cat = HierarchicalCategory.from_spec(
-                code=code, spec=spec, categorization=self
+        Categorization._add_categories(self, categories)
+        self._add_relationships(categories)
+
+    def _add_relationships(self, categories: typing.Dict[str, typing.Dict]):
+        # add nodes and edges in bulk, which is much faster than adding them one by
+        # one for large categorizations
+        self._graph.add_nodes_from(
+            self._primary_code_map[code] for code in categories.keys()
+        )
+        self._graph.add_edges_from(
+            (
+                self._all_codes_map[code],
+                self._all_codes_map[child_code],
+                {"set": i},
             )
-
-            self._primary_code_map[code] = cat
-            self._graph.add_node(cat)
-            for icode in cat.codes:
-                self._all_codes_map[icode] = cat
-
-        for code, spec in categories.items():
-            if "children" in spec:
-                parent = self._all_codes_map[code]
-                for i, child_set in enumerate(spec["children"]):
-                    for child_code in child_set:
-                        self._graph.add_edge(
-                            parent, self._all_codes_map[child_code], set=i
-                        )
+            for code, spec in categories.items()
+            for i, child_set in enumerate(spec.get("children", ()))
+            for child_code in child_set
+        )
 
     def __init__(
         self,
@@ -572,6 +669,15 @@ class HierarchicalCategorization(Categorization):
         canonical_top_level_category: typing.Optional[str] = None,
     ):
         self._graph = nx.MultiDiGraph()
+        self._canonical_subgraph_cache: typing.Optional[nx.DiGraph] = None
+        self._levels_cache: typing.Optional[
+            typing.Dict[HierarchicalCategory, int]
+        ] = None
+        # graph traversals query the same categories over and over, so keep the
+        # most recently used child sets
+        self._children_cached = functools.lru_cache(maxsize=4096)(
+            self._children_uncached
+        )
         Categorization.__init__(
             self,
             categories=categories,
@@ -585,14 +691,25 @@ class HierarchicalCategorization(Categorization):
         )
         self.total_sum = total_sum
         if canonical_top_level_category is None:
-            self.canonical_top_level_category: typing.Optional[
-                HierarchicalCategory
-            ] = None
+            self.canonical_top_level_category = None
         else:
             self.canonical_top_level_category = self._all_codes_map[
                 canonical_top_level_category
             ]
 
+    @property
+    def canonical_top_level_category(self) -> typing.Optional[HierarchicalCategory]:
+        """The top level category with respect to which levels are calculated."""
+        return self._canonical_top_level_category
+
+    @canonical_top_level_category.setter
+    def canonical_top_level_category(
+        self, value: typing.Optional[HierarchicalCategory]
+    ) -> None:
+        self._canonical_top_level_category = value
+        # levels are relative to the canonical top level category
+        self._levels_cache = None
+
     def __getitem__(self, code: str) -> HierarchicalCategory:
         """Get the category for a code."""
         return self._all_codes_map[code]
@@ -668,12 +785,17 @@ class HierarchicalCategorization(Categorization):
     def _canonical_subgraph(self) -> nx.DiGraph:
         # TODO: from python 3.8 on, there is functools.cached_property to
         # automatically cache this - as soon as we drop python 3.7 support, we can
-        # easily add it.
-        return nx.DiGraph(
-            self._graph.edge_subgraph(
-                ((u, v, 0) for (u, v, s) in self._graph.edges(data="set") if s == 0)
+        # replace the manual caching.
+        if self._canonical_subgraph_cache is None:
+            # build the graph in one pass over the edges, which is much faster than
+            # copying an edge subgraph view
+            csg = nx.DiGraph()
+            csg.add_nodes_from(self._graph)
+            csg.add_edges_from(
+                (u, v) for (u, v, s) in self._graph.edges(data="set") if s == 0
             )
-        )
+            self._canonical_subgraph_cache = csg
+        return self._canonical_subgraph_cache
 
     def _show_subtree(
         self,
@@ -841,46 +963,63 @@ class HierarchicalCategorization(Categorization):
         -------
         Extended categorization : HierarchicalCategorization
         """
-        spec = self._extend_prepare(
-            name=name,
-            categories=categories,
-            title=title,
-            comment=comment,
-            last_update=last_update,
-            alternative_codes=alternative_codes,
+        ext = HierarchicalCategorization(
+            categories={},
+            total_sum=self.total_sum,
+            **self._extend_metadata(
+                name=name, title=title, comment=comment, last_update=last_update
+            ),
+        )
+        self._extend_categories(
+            ext, categories=categories, alternative_codes=alternative_codes
         )
 
+        # re-use the existing graph structure with the new category objects
+        ext._graph = nx.relabel_nodes(
+            self._graph,
+            {cat: ext._primary_code_map[code] for code, cat in self.items()},
+        )
+        if categories is not None:
+            # replaced categories lose their previous children
+            ext._graph.remove_edges_from(
+                [
+                    edge
+                    for code in categories.keys()
+                    if code in self._primary_code_map
+                    for edge in ext._graph.out_edges(
+                        ext._primary_code_map[code], keys=True
+                    )
+                ]
+            )
+            ext._add_relationships(categories)
+
         if children is not None:
-            for parent, child_set in children:
-                if "children" not in spec["categories"][parent]:
-                    spec["categories"][parent]["children"] = []
-                spec["categories"][parent]["children"].append(child_set)
+            for parent_code, child_set in children:
+                parent = ext._primary_code_map[parent_code]
+                setno = 1 + max(
+                    (s for (_, _, s) in ext._graph.out_edges(parent, data="set")),
+                    default=-1,
+                )
+                ext._graph.add_edges_from(
+                    (parent, ext._all_codes_map[child_code], {"set": setno})
+                    for child_code in child_set
+                )
 
-        return HierarchicalCategorization.from_spec(spec)
+        if self.canonical_top_level_category is not None:
+            ext.canonical_top_level_category = ext._primary_code_map[
+                self.canonical_top_level_category.codes[0]
+            ]
 
-    @property
-    def df(self) -> "pandas.DataFrame":
-        """All category codes as a pandas dataframe."""
-        titles = []
-        comments = []
-        alternative_codes = []
-        children = []
-        for cat in self.values():
-            titles.append(cat.title)
-            comments.append(cat.comment)
-            alternative_codes.append(cat.codes[1:])
-            children.append(
-                tuple(tuple(sorted(c.codes[0] for c in cs)) for cs in cat.children)
-            )
-        return pandas.DataFrame(
-            index=self.keys(),
-            data={
-                "title": titles,
-                "comment": comments,
-                "alternative_codes": alternative_codes,
-                "children": children,
-            },
-        )
+        return ext
+
+    def _df_columns(self) -> typing.Dict[str, list]:
+        """The columns of the dataframe representation, one list per attribute."""
+        columns = Categorization._df_columns(self)
+        columns["children"] = [
+            tuple(tuple(sorted(c.codes[0] for c in cs)) for cs in cat.children)
+            for cat in self.values()
+        ]
+        return columns
 
     def level(self, cat: typing.Union[str, HierarchicalCategory]) -> int:
         """The level of the given category.
@@ -899,23 +1038,58 @@ class HierarchicalCategorization(Categorization):
                 "Can not calculate the level without a canonical_top_level_category."
             )
 
-        # first use the canonical subgraph for shortest paths
-        csg = self._canonical_subgraph
         try:
-            sp = nx.shortest_path_length(csg, self.canonical_top_level_category, cat)
-        except (nx.NetworkXNoPath, nx.NodeNotFound):
+            return self._levels[cat]
+        except KeyError:
+            raise self._no_level_error(cat) from None
+
+    def levels(
+        self, cats: typing.Iterable[typing.Union[str, HierarchicalCategory]]
+    ) -> typing.List[int]:
+        """The levels of many categories at once.
+
+        Equivalent to ``[cat.level(c) for c in cats]``, but faster for many
+        categories. See ``level`` for details.
+        """
+        if not isinstance(self.canonical_top_level_category, HierarchicalCategory):
+            raise ValueError(
+                "Can not calculate the level without a canonical_top_level_category."
+            )
+
+        levels = self._levels
+        all_codes_map = self._all_codes_map
+        result = []
+        for cat in cats:
+            if not isinstance(cat, HierarchicalCategory):
+                cat = all_codes_map[cat]
             try:
-                sp = nx.shortest_path_length(
-                    self._graph, self.canonical_top_level_category, cat
-                )
-            except (nx.NetworkXNoPath, nx.NodeNotFound):
-                raise ValueError(
-                    f"{cat.codes[0]!r} is not a transitive child of the "
-                    f"canonical top level "
-                    f"{self.canonical_top_level_category.codes[0]!r}."
-                )
+                result.append(levels[cat])
+            except KeyError:
+                raise self._no_level_error(cat) from None
+        return result
+
+    def _no_level_error(self, cat: HierarchicalCategory) -> ValueError:
+        return ValueError(
+            f"{cat.codes[0]!r} is not a transitive child of the "
+            f"canonical top level "
+            f"{self.canonical_top_level_category.codes[0]!r}."
+        )
 
-        return sp + 1
+    @property
+    def _levels(self) -> typing.Dict[HierarchicalCategory, int]:
+        """The levels of all transitive children of the canonical top level category.
+
+        Calculated once with a breadth-first search over all sets of children and
+        then overwritten with the results of a breadth-first search over the
+        canonical subgraph, which takes precedence."""
+        if self._levels_cache is None:
+            top = self.canonical_top_level_category
+            levels = {}
+            for graph in (self._graph, self._canonical_subgraph):
+                if top in graph:
+                    levels.update(nx.single_source_shortest_path_length(graph, top))
+            self._levels_cache = {cat: sp + 1 for cat, sp in levels.items()}
+        return self._levels_cache
 
     def parents(
         self, cat: typing.Union[str, HierarchicalCategory]
@@ -926,6 +1100,43 @@ class HierarchicalCategorization(Categorization):
 
         return set(self._graph.predecessors(cat))
 
+    def descendants(
+        self, cat: typing.Union[str, HierarchicalCategory]
+    ) -> typing.Set[HierarchicalCategory]:
+        """All transitive children of the given category, considering all sets of
+        children."""
+        if not isinstance(cat, HierarchicalCategory):
+            return self.descendants(self._all_codes_map[cat])
+
+        return self._reachable(self._graph.succ, cat)
+
+    def ancestors(
+        self, cat: typing.Union[str, HierarchicalCategory]
+    ) -> typing.Set[HierarchicalCategory]:
+        """All transitive parents of the given category, considering all sets of
+        children."""
+        if not isinstance(cat, HierarchicalCategory):
+            return self.ancestors(self._all_codes_map[cat])
+
+        return self._reachable(self._graph.pred, cat)
+
+    @staticmethod
+    def _reachable(
+        adjacency: typing.Mapping[HierarchicalCategory, typing.Iterable],
+        cat: HierarchicalCategory,
+    ) -> typing.Set[HierarchicalCategory]:
+        # depth-first search directly on the adjacency structure, which is about twice
+        # as fast as the generic nx.descendants and nx.ancestors
+        reachable = set()
+        stack = [cat]
+        while stack:
+            for neighbor in adjacency[stack.pop()]:
+                if neighbor not in reachable:
+                    reachable.add(neighbor)
+                    stack.append(neighbor)
+        reachable.discard(cat)
+        return reachable
+
     def children(
         self, cat: typing.Union[str, HierarchicalCategory]
     ) -> typing.List[typing.Set[HierarchicalCategory]]:
@@ -933,14 +1144,22 @@ class HierarchicalCategorization(Categorization):
         if not isinstance(cat, HierarchicalCategory):
             return self.children(self._all_codes_map[cat])
 
-        children_dict = {}
-        for (_, child, setno) in self._graph.edges(cat, "set"):
-            if setno not in children_dict:
-                children_dict[setno] = []
-            children_dict[setno].append(child)
+        return [set(child_set) for child_set in self._children_cached(cat)]
 
-        children = [set(children_dict[x]) for x in sorted(children_dict.keys())]
-        return children
+    def _children_uncached(
+        self, cat: HierarchicalCategory
+    ) -> typing.Tuple[typing.FrozenSet[HierarchicalCategory], ...]:
+        # read the adjacency structure of the graph directly, which avoids the
+        # overhead of the generic edge view
+        children_dict = {}
+        for child, edges in self._graph.succ[cat].items():
+            for edge in edges.values():
+                setno = edge["set"]
+                if setno not in children_dict:
+                    children_dict[setno] = []
+                children_dict[setno].append(child)
+
+        return tuple(frozenset(children_dict[x]) for x in sorted(children_dict.keys()))
 
 
 def from_pickle(
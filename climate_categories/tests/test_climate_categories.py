@@ -4,7 +4,9 @@ import datetime
 import importlib
 import importlib.resources
 import pathlib
+import pickle
 
+import numpy as np
 import pandas as pd
 import pytest
 import strictyaml
@@ -72,6 +74,20 @@ class TestSimple:
         ]
         assert len(SimpleCat) == 4
 
+    def test_getmany(self, SimpleCat: climate_categories.Categorization):
+        assert SimpleCat.getmany(["1", "A", "2"]) == [
+            SimpleCat["1"],
+            SimpleCat["1"],
+            SimpleCat["2"],
+        ]
+        assert SimpleCat.getmany(pd.Series(["2", "CatC"])) == [
+            SimpleCat["2"],
+            SimpleCat["3"],
+        ]
+        assert SimpleCat.getmany([]) == []
+        with pytest.raises(KeyError):
+            SimpleCat.getmany(["1", "nonexisting"])
+
     def test_comparisons(self, SimpleCat: climate_categories.Categorization):
         assert list(sorted(SimpleCat.values())) == [
             SimpleCat["1"],
@@ -127,6 +143,11 @@ class TestSimple:
         )
         pd.testing.assert_frame_equal(SimpleCat.df, expected)
 
+    def test_df_cached(self, SimpleCat: climate_categories.Categorization):
+        df = SimpleCat.df
+        df.loc["1", "title"] = "changed"
+        assert SimpleCat.df.loc["1", "title"] == "Category 1"
+
     def test_extend(self, SimpleCat: climate_categories.Categorization):
         SimpleCat_ext = SimpleCat.extend(
             name="ext",
@@ -192,6 +213,21 @@ class TestSimple:
         assert list(SimpleCat_ext.keys()) == ["1", "2", "3", "unnumbered", "4", "t"]
         assert len(SimpleCat_ext) == 6
 
+    def test_extend_str_subclass(self, SimpleCat: climate_categories.Categorization):
+        ext = SimpleCat.extend(
+            name="ext",
+            categories={np.str_("4"): {"title": "Category 4"}},
+            alternative_codes={np.str_("I"): "1"},
+        )
+        assert ext["I"] == ext["1"]
+        assert ext["4"].codes == ("4",)
+        assert type(ext["1"].codes[-1]) is str
+
+    def test_extend_non_str_code(self, SimpleCat: climate_categories.Categorization):
+        ext = SimpleCat.extend(name="ext", categories={4: {"title": "Category 4"}})
+        assert ext[4].codes == (4,)
+        assert "4" not in ext
+
     def test_extend_defaults(self, SimpleCat: climate_categories.Categorization):
         a = SimpleCat.extend(name="ext")
         assert a.name == "SimpleCat_ext"
@@ -274,6 +310,18 @@ class TestHierarchical:
         ):
             HierCat.level("OT")
 
+        assert HierCat.levels(["0", "1", HierCat["2"], "0X3", "1b"]) == [1, 2, 2, 2, 3]
+        with pytest.raises(
+            ValueError,
+            match="'OT' is not a transitive child of the canonical top level '0'.",
+        ):
+            HierCat.levels(["1", "OT"])
+
+        with pytest.raises(ValueError) as excinfo:
+            HierCat.level("OT")
+        assert excinfo.value.__cause__ is None
+        assert excinfo.value.__suppress_context__
+
     def test_dict_like(self, HierCat: climate_categories.HierarchicalCategorization):
         assert "0" in HierCat
         assert list(HierCat.all_keys()) == [
@@ -443,6 +491,37 @@ class TestHierarchical:
         with pytest.raises(ValueError, match="Can not calculate the level"):
             HierCat["1"].level
 
+    def test_level_top_level_changed(
+        self, HierCat: climate_categories.HierarchicalCategorization
+    ):
+        assert HierCat.level("1B") == 3
+        HierCat.canonical_top_level_category = HierCat["OT"]
+        assert HierCat.level("OT") == 1
+        assert HierCat.level("1B") == 2
+        with pytest.raises(ValueError, match="not a transitive child"):
+            HierCat.level("0")
+
+    def test_descendants_ancestors(
+        self, HierCat: climate_categories.HierarchicalCategorization
+    ):
+        assert HierCat["1"].descendants == {HierCat["1A"], HierCat["1B"]}
+        assert HierCat.descendants("0X3") == {
+            HierCat["1"],
+            HierCat["2"],
+            HierCat["1A"],
+            HierCat["1B"],
+            HierCat["2A"],
+            HierCat["2B"],
+        }
+        assert HierCat["3A"].descendants == set()
+        assert HierCat["1B"].ancestors == {
+            HierCat["0"],
+            HierCat["1"],
+            HierCat["0X3"],
+            HierCat["OT"],
+        }
+        assert HierCat.ancestors("0") == set()
+
     def test_parents_code(self, HierCat):
         assert HierCat.parents(HierCat["1"]) == HierCat.parents("1")
 
@@ -602,6 +681,14 @@ class TestIO:
             tmpdir / "any_cat.pickle"
         ) == climate_categories.Categorization.from_pickle(tmpdir / "any_cat.pickle")
 
+    def test_pickle_objects(self, any_cat):
+        any_cat_r = pickle.loads(pickle.dumps(any_cat))
+        assert any_cat == any_cat_r
+        assert list(any_cat.all_keys()) == list(any_cat_r.all_keys())
+
+        cat, cat_r = pickle.loads(pickle.dumps((any_cat, any_cat["1"])))
+        assert cat_r is cat["1"]
+
     def test_roundtrip_hierarchical(self, tmpdir, HierCat):
         HierCat.to_yaml(tmpdir / "HierCat.yaml")
         HierCat_r = climate_categories.HierarchicalCategorization.from_yaml(